@@ -1,6 +1,6 @@
 import argparse,logging,platform,psutil,os
-from src.audio_extractor import AudioExtractor
 from src.whisper_subtitle_generator import WhisperSubtitleGenerator
+from src.memory_governor import MemoryGovernor
 from src import logger
 import os
 
@@ -8,33 +8,23 @@ import os
 DEFAULT_LANGUAGES = [
     {
         "code": "en",
-        "name": "english",
-        "from_code": "zh",
-        "to_code": "en"
+        "name": "english"
     },
     {
         "code": "fr", 
-        "name": "french",
-        "from_code": "en",
-        "to_code": "fr"
+        "name": "french"
     },
     {
         "code": "es",
-        "name": "spanish", 
-        "from_code": "en",
-        "to_code": "es"
+        "name": "spanish"
     },
     {
         "code": "ja",
-        "name": "japanese",
-        "from_code": "en", 
-        "to_code": "ja"
+        "name": "japanese"
     },
     {
         "code": "ko",
-        "name": "korean",
-        "from_code": "en",
-        "to_code": "ko"
+        "name": "korean"
     }
 ]
 
@@ -95,21 +85,14 @@ class WhisperConfig:
 
 model_config = WhisperConfig().select_model_by_memory()
 
-def process_media_file(input_path: str, device_id: str, model_name: str, generator: WhisperSubtitleGenerator):
-    """处理视频或音频文件"""
-    extractor = AudioExtractor()
-    
-    if os.path.splitext(input_path)[1].lower() in extractor.supported_formats:
-        audio_path = extractor.extract_audio(input_path)
-        logger.info(f"提取的音频文件路径: {audio_path}")
-    else:
-        audio_path = input_path
-        logger.info(f"使用输入文件作为音频: {audio_path}")
-
+def process_media_file(input_path: str, device_id: str, model_name: str, generator: WhisperSubtitleGenerator,
+                       keep_intermediate: bool = False):
+    """处理视频或音频文件，音频在内存中解码，不生成中间文件"""
     subtitle_paths = generator.generate_subtitles(
-        input_path=audio_path,
+        input_path=input_path,
         device_id=device_id,
-        model_name=model_name
+        model_name=model_name,
+        keep_intermediate=keep_intermediate
     )
     
     # logger.info("生成的字幕文件路径:")
@@ -140,6 +123,10 @@ def main():
                         help='Whisper模型名称')
     parser.add_argument('--languages', type=str,
                         help='要生成的目标语言代码列表，用逗号分隔 (例如: en,fr,es)')
+    parser.add_argument('--keep-intermediate', action='store_true',
+                        help='保留中间的 WAV 音频和 JSON 转录文件')
+    parser.add_argument('--temp-dir', type=str,
+                        help='长音频内存映射临时文件所在目录 (默认: 输入文件所在目录)')
     args = parser.parse_args()
     
     if not os.path.exists(args.input_path):
@@ -153,8 +140,13 @@ def main():
     else:
         languages = DEFAULT_LANGUAGES
 
-    # 初始化字幕生成器
-    generator = WhisperSubtitleGenerator(languages=languages)
+    # 初始化内存调节器和字幕生成器
+    memory_governor = MemoryGovernor(
+        batch_size=model_config['batch_size'],
+        device=args.device_id
+    )
+    generator = WhisperSubtitleGenerator(languages=languages, memory_governor=memory_governor,
+                                         temp_dir=args.temp_dir)
     
     # 根据文件类型选择处理方式
     file_ext = os.path.splitext(args.input_path)[1].lower()
@@ -162,7 +154,8 @@ def main():
         if file_ext in ['.srt', '.json']:
             process_subtitle_file(args.input_path, generator)
         else:
-            process_media_file(args.input_path, args.device_id, args.model_name, generator)
+            process_media_file(args.input_path, args.device_id, args.model_name, generator,
+                               keep_intermediate=args.keep_intermediate)
     except Exception as e:
         logger.error(f"处理过程中出错: {e}")
         return
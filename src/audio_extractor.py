@@ -1,10 +1,23 @@
 import os
-from moviepy.video.io.VideoFileClip import VideoFileClip
+import json
 import subprocess
+import tempfile
+import numpy as np
+import psutil
+from src import logger
+
+# Whisper 需要的采样率
+SAMPLE_RATE = 16000
 
 class AudioExtractor:
-    def __init__(self):
-        self.supported_formats = ['.mp4', '.mov', '.avi', '.mkv']
+    def __init__(self, max_memory_ratio: float = 0.25, temp_dir: str = None):
+        """
+        初始化音频提取器
+        :param max_memory_ratio: 音频缓冲超过可用内存的该比例时改用内存映射临时文件
+        :param temp_dir: 内存映射临时文件所在目录，默认使用媒体文件所在目录
+        """
+        self.max_memory_ratio = max_memory_ratio
+        self.temp_dir = temp_dir
     
     def extract_audio(self, video_path: str) -> str:
         """从视频文件中提取音频"""
@@ -24,7 +37,7 @@ class AudioExtractor:
                 'ffmpeg', '-i', video_path,
                 '-vn',  # 不处理视频
                 '-acodec', 'pcm_s16le',  # 音频编码为16位PCM
-                '-ar', '16000',  # 采样率16kHz
+                '-ar', str(SAMPLE_RATE),  # 采样率16kHz
                 '-ac', '1',  # 单声道
                 '-y',  # 覆盖已存在的文件
                 audio_path
@@ -36,18 +49,107 @@ class AudioExtractor:
             raise RuntimeError(f"提取音频时出错: {e}")
         return audio_path
 
-    def _check_audio_stream(self, video_path: str) -> bool:
-        """检查视频文件是否包含有效的音频流"""
-        if os.path.exists('/tmp/test.wav'):
-            os.remove('/tmp/test.wav')
-        command = ['ffmpeg', '-i', video_path, '-ar', '16000', '/tmp/test.wav']
+    def load_audio(self, media_path: str) -> np.ndarray:
+        """通过 ffmpeg 管道将音频解码为内存中的 float32 数组，不生成中间文件"""
+        if not os.path.exists(media_path):
+            raise FileNotFoundError(f"媒体文件不存在: {media_path}")
+
+        duration = self._probe_audio_duration(media_path)
+        if duration is None:
+            raise RuntimeError(f"媒体文件 {media_path} 中没有有效的音频流")
+
+        command = [
+            'ffmpeg', '-nostdin',
+            '-loglevel', 'error',
+            '-i', media_path,
+            '-vn',  # 不处理视频
+            '-f', 'f32le',  # 直接输出 float32 PCM，无需再转换
+            '-ac', '1',  # 单声道
+            '-ar', str(SAMPLE_RATE),  # 采样率16kHz
+            '-'
+        ]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            if duration > 0:
+                # 预留 1 秒余量，避免时长估算误差导致缓冲不足
+                buffer = self._allocate_buffer(int((duration + 1) * SAMPLE_RATE), media_path)
+                samples = self._read_into(process.stdout, buffer)
+                extra = process.stdout.read()
+                if extra:
+                    logger.warning("音频长度超出预估，追加缓冲")
+                    buffer = np.concatenate([buffer[:samples], np.frombuffer(extra, np.float32)])
+                    samples = len(buffer)
+            else:
+                buffer = np.frombuffer(process.stdout.read(), np.float32)
+                samples = len(buffer)
+            stderr = process.stderr.read()
+        finally:
+            process.stdout.close()
+            process.stderr.close()
+
+        if process.wait() != 0:
+            raise RuntimeError(f"解码音频时出错: {stderr.decode(errors='ignore')}")
+        logger.debug(f"已加载音频: {samples / SAMPLE_RATE:.1f} 秒")
+        return buffer[:samples]
 
+    def _allocate_buffer(self, samples: int, media_path: str) -> np.ndarray:
+        """分配音频缓冲，超过内存阈值时使用内存映射的匿名临时文件"""
+        size = samples * np.dtype(np.float32).itemsize
+        if size <= psutil.virtual_memory().available * self.max_memory_ratio:
+            return np.empty(samples, dtype=np.float32)
+
+        temp_dir = self._select_temp_dir(media_path)
+        logger.info(f"音频缓冲 {size / 1024 ** 2:.0f} MB 超过内存阈值，使用内存映射临时文件: {temp_dir}")
+        # 匿名临时文件在关闭后即被删除，映射仍然有效
+        with tempfile.TemporaryFile(dir=temp_dir) as f:
+            return np.memmap(f, dtype=np.float32, mode='w+', shape=(samples,))
+
+    def _select_temp_dir(self, media_path: str) -> str:
+        """
+        选择内存映射临时文件的目录：优先使用配置目录，其次媒体文件所在目录，最后是 TMPDIR
+        默认临时目录常为基于内存的 tmpfs，无法降低内存占用，因此放在最后
+        """
+        candidates = [self.temp_dir, os.path.dirname(os.path.abspath(media_path)), tempfile.gettempdir()]
+        for directory in candidates:
+            if directory and os.path.isdir(directory) and os.access(directory, os.W_OK):
+                return directory
+        return tempfile.gettempdir()
+
+    def _read_into(self, stream, buffer: np.ndarray) -> int:
+        """将管道数据直接读入缓冲，返回读取的采样数"""
+        view = memoryview(buffer.view(np.uint8))
+        offset = 0
+        while offset < len(view):
+            read = stream.readinto(view[offset:])
+            if not read:
+                break
+            offset += read
+        return offset // buffer.itemsize
+
+    def _probe_audio_duration(self, media_path: str):
+        """获取音频时长（秒），没有音频流时返回 None，时长未知时返回 0"""
+        command = [
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'a',
+            '-show_entries', 'stream=duration:format=duration',
+            '-of', 'json',
+            media_path
+        ]
         result = subprocess.run(command, capture_output=True, text=True, check=True)
+        probe_data = json.loads(result.stdout or '{}')
+        streams = probe_data.get('streams', [])
+        if not streams:
+            return None
+        for value in (streams[0].get('duration'), probe_data.get('format', {}).get('duration')):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                continue
+        return 0.0
 
-        # 检查输出中是否包含音频流的信息
-        if "Audio:" in result.stderr:
+    def _check_audio_stream(self, video_path: str) -> bool:
+        """检查视频文件是否包含有效的音频流"""
+        if self._probe_audio_duration(video_path) is not None:
             return True
-        else:
-            # 输出错误信息以帮助调试
-            print(f"音频流检查失败: {result.stderr}")
+        logger.error(f"音频流检查失败: {video_path}")
         return False
\ No newline at end of file
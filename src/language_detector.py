@@ -0,0 +1,113 @@
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+import numpy as np
+from src import logger
+from src.audio_extractor import SAMPLE_RATE
+from src.memory_governor import MemoryGovernor, torch_device
+
+
+# 用于区分拉丁字母语言的常用词
+LATIN_STOPWORDS = {
+    "en": {"the", "and", "is", "you", "that", "it", "of", "to", "what", "this", "i", "we"},
+    "fr": {"le", "la", "les", "et", "est", "vous", "que", "je", "nous", "une", "des", "pas"},
+    "es": {"el", "los", "las", "y", "es", "que", "usted", "yo", "una", "por", "pero", "muy"},
+    "de": {"der", "die", "das", "und", "ist", "ich", "nicht", "sie", "wir", "ein", "eine", "zu"},
+}
+
+# 各文字系统的 Unicode 范围
+SCRIPT_PATTERNS = {
+    "kana": re.compile(r"[぀-ヿ]"),
+    "hangul": re.compile(r"[가-힯ᄀ-ᇿ]"),
+    "han": re.compile(r"[一-鿿㐀-䶿]"),
+    "latin": re.compile(r"[A-Za-zÀ-ɏ]"),
+}
+
+WORD_PATTERN = re.compile(r"[a-zÀ-ɏ']+")
+
+
+class LanguageDetector:
+    def __init__(self, memory_governor: MemoryGovernor, model_name: str = "tiny", sample_seconds: int = 30,
+                 min_confidence: float = 0.7):
+        """
+        初始化语言检测器
+        :param memory_governor: 内存调节器，检测完成后用于释放模型占用的内存
+        :param model_name: 用于音频语言检测的 Whisper 模型
+        :param sample_seconds: 用于检测的音频时长（秒）
+        :param min_confidence: 采用音频检测结果所需的最低置信度
+        """
+        self.memory_governor = memory_governor
+        self.model_name = model_name
+        self.sample_seconds = sample_seconds
+        self.min_confidence = min_confidence
+
+    def detect_audio(self, audio: np.ndarray, device_id: str = "cpu",
+                     default: Optional[str] = None) -> Optional[str]:
+        """
+        使用 Whisper 检测已解码音频开头片段的语言
+        检测模型只在检测期间加载，完成后立即释放，避免与转录模型争用显存
+        """
+        try:
+            # openai-whisper 的稀疏 alignment_heads 缓冲无法移动到 MPS，小模型在 CPU 上检测 30 秒音频足够快
+            device = torch_device(device_id)
+            if device == "mps":
+                device = "cpu"
+            language, confidence = self._detect_language(audio, device)
+            if confidence < self.min_confidence:
+                # 开头的音乐或其他语言的片头不足以决定整个文件的语言
+                logger.info(f"音频语言置信度过低 ({language} {confidence:.2f})，由转录模型自行判断")
+                return default
+            logger.info(f"检测到音频语言: {language} (置信度 {confidence:.2f})")
+            return language
+        except Exception as e:
+            logger.warning(f"音频语言检测失败，由转录模型自行判断: {e}")
+            return default
+        finally:
+            # 模型和特征只存在于 _detect_language 的局部作用域，此时已可回收
+            self.memory_governor.release()
+
+    def _detect_language(self, audio: np.ndarray, device: str):
+        """加载检测模型并返回最可能的语言及其置信度"""
+        import whisper
+
+        logger.debug(f"加载语言检测模型: {self.model_name} ({device})")
+        model = whisper.load_model(self.model_name, device=device)
+
+        sample = np.array(audio[:self.sample_seconds * SAMPLE_RATE], dtype=np.float32)
+        sample = whisper.pad_or_trim(sample)
+        mel = whisper.log_mel_spectrogram(sample, n_mels=model.dims.n_mels).to(model.device)
+        _, probs = model.detect_language(mel)
+        language = max(probs, key=probs.get)
+        return language, probs[language]
+
+    def detect_text(self, chunks: List[Dict], default: str = "zh", max_chunks: int = 200) -> str:
+        """根据字幕文本的文字系统和常用词判断语言"""
+        text = " ".join(chunk["text"] for chunk in chunks[:max_chunks])
+        counts = {name: len(pattern.findall(text)) for name, pattern in SCRIPT_PATTERNS.items()}
+        total = sum(counts.values())
+        if total == 0:
+            logger.warning(f"无法识别字幕语言，使用默认语言 {default}")
+            return default
+
+        # 假名判定优先于汉字，日文中常混有大量汉字
+        if counts["kana"] / total > 0.05:
+            language = "ja"
+        elif counts["hangul"] / total > 0.3:
+            language = "ko"
+        elif counts["han"] / total > 0.3:
+            language = "zh"
+        else:
+            language = self._detect_latin(text)
+
+        logger.info(f"检测到字幕语言: {language}")
+        return language
+
+    def _detect_latin(self, text: str) -> str:
+        """通过常用词频率区分拉丁字母语言"""
+        words = Counter(WORD_PATTERN.findall(text.lower()))
+        scores = {
+            lang: sum(words[word] for word in stopwords)
+            for lang, stopwords in LATIN_STOPWORDS.items()
+        }
+        language = max(scores, key=scores.get)
+        return language if scores[language] > 0 else "en"
@@ -0,0 +1,160 @@
+import gc
+from typing import Optional
+import psutil
+from src import logger
+
+
+# 内存不足时的模型降级链
+MODEL_FALLBACKS = {
+    "openai/whisper-large-v3": "openai/whisper-large-v3-turbo",
+    "openai/whisper-large-v3-turbo": "openai/whisper-medium",
+    "openai/whisper-large-v2": "openai/whisper-medium",
+    "openai/whisper-medium": "openai/whisper-small",
+    "openai/whisper-small": "openai/whisper-base",
+    "openai/whisper-base": "openai/whisper-tiny",
+    "openai/whisper-medium.en": "openai/whisper-small.en",
+    "openai/whisper-small.en": "openai/whisper-base.en",
+    "openai/whisper-base.en": "openai/whisper-tiny.en",
+}
+
+# 判断内存不足的错误关键字
+OOM_MARKERS = (
+    "out of memory",
+    "outofmemoryerror",
+    "mps backend out of memory",
+    "cannot allocate memory",
+    "memoryerror",
+)
+
+
+def torch_device(device_id: str) -> str:
+    """将命令行设备ID转换为 torch 设备名称"""
+    if device_id in ("mps", "cpu"):
+        return device_id
+    if device_id.isdigit():
+        return f"cuda:{device_id}"
+    return device_id if device_id.startswith("cuda") else "cpu"
+
+
+class MemoryGovernor:
+    def __init__(self, batch_size: int, device: str = "cpu", min_batch_size: int = 1,
+                 low_memory_ratio: float = 0.10, high_memory_ratio: float = 0.30,
+                 cooldown_steps: int = 3):
+        """
+        初始化内存调节器
+        :param batch_size: 初始（也是最大）批处理大小
+        :param device: 设备ID (mps / cpu / cuda / GPU 编号)
+        :param min_batch_size: 最小批处理大小
+        :param low_memory_ratio: 可用内存比例低于该值时缩小批处理
+        :param high_memory_ratio: 可用内存比例高于该值时恢复批处理
+        :param cooldown_steps: 内存不足后需连续成功的次数，之后才允许增大批处理
+        """
+        self.max_batch_size = max(1, batch_size)
+        self.batch_size = self.max_batch_size
+        self.min_batch_size = max(1, min(min_batch_size, self.max_batch_size))
+        self.device = torch_device(device)
+        self.low_memory_ratio = low_memory_ratio
+        self.high_memory_ratio = high_memory_ratio
+        self.cooldown_steps = cooldown_steps
+        # 发生内存不足后，批处理大小不再超过失败时的大小
+        self.batch_ceiling = self.max_batch_size
+        self.cooldown = 0
+
+    def _system_memory_ratio(self) -> float:
+        """获取系统可用内存比例"""
+        memory = psutil.virtual_memory()
+        return memory.available / memory.total if memory.total else 1.0
+
+    def _device_memory_ratio(self) -> Optional[float]:
+        """获取加速器可用显存比例，无法获取时返回 None"""
+        try:
+            import torch
+            if self.device.startswith("cuda") and torch.cuda.is_available():
+                free, total = torch.cuda.mem_get_info(self.device)
+                return free / total if total else None
+            if self.device == "mps" and torch.backends.mps.is_available():
+                total = torch.mps.recommended_max_memory()
+                used = torch.mps.driver_allocated_memory()
+                return max(0.0, (total - used) / total) if total else None
+        except (ImportError, AttributeError, RuntimeError):
+            pass
+        return None
+
+    def available_memory_ratio(self) -> float:
+        """获取系统内存与加速器显存中较紧张的可用比例"""
+        ratio = self._system_memory_ratio()
+        device_ratio = self._device_memory_ratio()
+        if device_ratio is not None:
+            ratio = min(ratio, device_ratio)
+        return ratio
+
+    def adjust(self) -> int:
+        """根据当前内存余量调整批处理大小"""
+        try:
+            ratio = self.available_memory_ratio()
+        except Exception as e:
+            logger.debug(f"获取内存信息失败: {e}")
+            return self.batch_size
+
+        if ratio < self.low_memory_ratio:
+            self.shrink(reason=f"可用内存 {ratio:.0%}")
+        elif ratio > self.high_memory_ratio and self.cooldown == 0 and self.batch_size < self.batch_ceiling:
+            old_size = self.batch_size
+            self.batch_size = min(self.batch_size * 2, self.batch_ceiling)
+            logger.info(f"内存余量恢复 (可用 {ratio:.0%})，批处理大小 {old_size} -> {self.batch_size}")
+        return self.batch_size
+
+    def shrink(self, reason: str = "内存不足") -> bool:
+        """将批处理大小减半，已到最小值时返回 False"""
+        self.release()
+        if self.batch_size <= self.min_batch_size:
+            return False
+        old_size = self.batch_size
+        self.batch_size = max(self.batch_size // 2, self.min_batch_size)
+        logger.warning(f"{reason}，批处理大小 {old_size} -> {self.batch_size}")
+        return True
+
+    def record_oom(self, failed_batch_size: int):
+        """记录内存不足时的批处理大小，作为之后增大批处理的上限"""
+        self.batch_ceiling = max(self.min_batch_size, min(self.batch_ceiling, failed_batch_size - 1))
+        self.cooldown = self.cooldown_steps
+
+    def record_success(self):
+        """记录一次成功的批处理，冷却结束后才允许增大批处理"""
+        if self.cooldown > 0:
+            self.cooldown -= 1
+
+    def fallback_model(self, model_name: str) -> Optional[str]:
+        """返回更小的模型名称，并重置批处理大小"""
+        fallback = MODEL_FALLBACKS.get(model_name)
+        if fallback:
+            logger.warning(f"内存不足，模型降级 {model_name} -> {fallback}")
+            self.batch_size = self.max_batch_size
+            self.batch_ceiling = self.max_batch_size
+            self.cooldown = 0
+        return fallback
+
+    def release(self):
+        """释放可回收的内存"""
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            elif torch.backends.mps.is_available():
+                torch.mps.empty_cache()
+        except (ImportError, AttributeError, RuntimeError):
+            pass
+
+    @staticmethod
+    def is_oom_error(error) -> bool:
+        """判断异常或错误输出是否由内存不足引起"""
+        while isinstance(error, BaseException):
+            if isinstance(error, MemoryError):
+                return True
+            if any(marker in f"{type(error).__name__} {error}".lower() for marker in OOM_MARKERS):
+                return True
+            error = error.__cause__
+        if isinstance(error, str):
+            return any(marker in error.lower() for marker in OOM_MARKERS)
+        return False
@@ -0,0 +1,107 @@
+import re
+from typing import Dict, List
+
+
+# 句末标点
+SENTENCE_END_PATTERN = re.compile(r"[。！？!?…．.;；]['\"”’」』)）]*$")
+
+# 不使用空格分词的文字（中日文字、假名）
+CJK_PATTERN = re.compile(r"[぀-ヿ一-鿿㐀-䶿＀-￯　-〿]")
+
+
+class SegmentMerger:
+    def __init__(self, max_gap: float = 0.8, max_chars: int = 200, max_chunks: int = 6):
+        """
+        初始化字幕合并器
+        :param max_gap: 相邻字幕间隔超过该值（秒）时断句
+        :param max_chars: 单个句子的最大字符数
+        :param max_chunks: 单个句子最多合并的字幕块数
+        """
+        self.max_gap = max_gap
+        self.max_chars = max_chars
+        self.max_chunks = max_chunks
+
+    def merge(self, chunks: List[Dict]) -> List[Dict]:
+        """将相邻字幕块按标点和时间间隔合并为句子"""
+        units = []
+        current = []
+
+        for i, chunk in enumerate(chunks):
+            current.append(i)
+            text = chunk["text"].strip()
+            next_chunk = chunks[i + 1] if i + 1 < len(chunks) else None
+
+            if (
+                next_chunk is None
+                or SENTENCE_END_PATTERN.search(text)
+                or self._gap(chunk, next_chunk) > self.max_gap
+                or len(current) >= self.max_chunks
+                or sum(len(chunks[j]["text"]) for j in current) >= self.max_chars
+            ):
+                units.append(self._build_unit(chunks, current))
+                current = []
+
+        return units
+
+    def redistribute(self, unit: Dict, text: str, chunks: List[Dict]) -> List[Dict]:
+        """按原字幕块的长度比例把译文分配回各字幕块的时间轴，不生成空字幕"""
+        indices = unit["indices"]
+
+        # 中日文按字符切分，其余语言按单词切分
+        if CJK_PATTERN.search(text):
+            tokens, separator = list(text.replace(" ", "")), ""
+        else:
+            tokens, separator = text.split(), " "
+        if not tokens:
+            return []
+
+        # 译文单元少于字幕块时，把相邻字幕块合并为跨越其时间范围的字幕
+        if len(tokens) < len(indices):
+            bounds = self._partition([1] * len(tokens), len(indices))
+            groups = [indices[start:end] for start, end in bounds]
+            return [{
+                "timestamp": [chunks[group[0]]["timestamp"][0], chunks[group[-1]]["timestamp"][1]],
+                "text": token
+            } for group, token in zip(groups, tokens)]
+
+        weights = [max(len(chunks[i]["text"].strip()), 1) for i in indices]
+        bounds = self._partition(weights, len(tokens))
+        return [{
+            "timestamp": chunks[i]["timestamp"],
+            "text": separator.join(tokens[start:end])
+        } for i, (start, end) in zip(indices, bounds)]
+
+    def _partition(self, weights: List[int], count: int) -> List[tuple]:
+        """按权重比例把 count 个元素切分为 len(weights) 段，每段至少一个元素"""
+        total = sum(weights)
+        bounds = []
+        start = 0
+        accumulated = 0
+        for k, weight in enumerate(weights):
+            accumulated += weight
+            remaining = len(weights) - k - 1
+            end = round(count * accumulated / total)
+            end = min(max(end, start + 1), count - remaining)
+            bounds.append((start, end))
+            start = end
+        return bounds
+
+    def _build_unit(self, chunks: List[Dict], indices: List[int]) -> Dict:
+        text = ""
+        for i in indices:
+            part = chunks[i]["text"].strip()
+            if text and part and not (CJK_PATTERN.search(text[-1]) or CJK_PATTERN.search(part[0])):
+                text += " "
+            text += part
+        return {
+            "timestamp": [chunks[indices[0]]["timestamp"][0], chunks[indices[-1]]["timestamp"][1]],
+            "text": text,
+            "indices": indices
+        }
+
+    def _gap(self, chunk: Dict, next_chunk: Dict) -> float:
+        end = chunk["timestamp"][1]
+        start = next_chunk["timestamp"][0]
+        if end is None or start is None:
+            return 0.0
+        return start - end
@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional
+import numpy as np
+from src import logger
+from src.audio_extractor import SAMPLE_RATE
+from src.memory_governor import MemoryGovernor, torch_device
+
+# Whisper 每个批次元素处理的音频长度（秒）
+CHUNK_LENGTH_S = 30
+
+# 每次交给流水线的音频窗口长度（秒），与批处理大小无关
+WINDOW_LENGTH_S = 600
+
+
+class WhisperTranscriber:
+    def __init__(self, memory_governor: MemoryGovernor):
+        """
+        初始化转录器，直接在进程内对内存中的音频运行 Whisper 流水线
+        :param memory_governor: 内存调节器，用于动态调整批处理大小
+        """
+        self.memory_governor = memory_governor
+        self._pipeline = None
+        self._pipeline_key = None
+
+    def _load_pipeline(self, model_name: str, device_id: str):
+        """加载（或复用）语音识别流水线"""
+        if self._pipeline_key == (model_name, device_id):
+            return self._pipeline
+
+        import torch
+        from transformers import pipeline
+
+        # 切换模型前先释放旧的流水线
+        self._pipeline = None
+        self.memory_governor.release()
+
+        device = torch_device(device_id)
+        logger.info(f"加载转录模型: {model_name} ({device})")
+        self._pipeline = pipeline(
+            "automatic-speech-recognition",
+            model=model_name,
+            torch_dtype=torch.float32 if device == "cpu" else torch.float16,
+            device=device,
+        )
+        self._pipeline_key = (model_name, device_id)
+        return self._pipeline
+
+    def transcribe(self, audio: np.ndarray, model_name: str, device_id: str,
+                   language: Optional[str] = None) -> List[Dict]:
+        """
+        按固定长度的窗口转录音频；内存不足时只重试失败的窗口
+        窗口边缘处的最后一个字幕块可能被截断，因此将其丢弃，
+        下一个窗口从上一个完整字幕块的结束时间继续
+        :return: 带绝对时间戳的字幕块列表
+        """
+        governor = self.memory_governor
+        window_samples = WINDOW_LENGTH_S * SAMPLE_RATE
+        chunks = []
+        start = 0
+        retry = False
+
+        while start < len(audio):
+            # 重试失败的窗口时直接使用缩小后的批处理，不再根据内存余量调整
+            batch_size = governor.batch_size if retry else governor.adjust()
+            retry = False
+            end = min(start + window_samples, len(audio))
+            oom_message = None
+            try:
+                window_chunks = self._transcribe_window(
+                    audio[start:end], model_name, device_id, language, batch_size
+                )
+            except Exception as e:
+                if not governor.is_oom_error(e):
+                    raise
+                oom_message = str(e)
+
+            if oom_message is not None:
+                # 离开 except 块后异常及其 traceback 已被清除，失败批次的张量此时才能释放
+                governor.record_oom(batch_size)
+                retry = True
+                # 内存不足时先缩小批处理，再降级模型后重试当前窗口
+                if governor.shrink(reason=f"转录内存不足 (批处理 {batch_size})"):
+                    continue
+                fallback = governor.fallback_model(model_name)
+                if fallback is None:
+                    raise RuntimeError(f"转录时内存不足: {oom_message}")
+                model_name = fallback
+                continue
+
+            governor.record_success()
+
+            offset = start / SAMPLE_RATE
+            window_end = end / SAMPLE_RATE
+            window_chunks = [{
+                "timestamp": [
+                    chunk["timestamp"][0] + offset,
+                    chunk["timestamp"][1] + offset if chunk["timestamp"][1] is not None else None
+                ],
+                "text": chunk["text"]
+            } for chunk in window_chunks]
+
+            next_start = end
+            if end < len(audio) and len(window_chunks) > 1:
+                # 丢弃可能被窗口截断的最后一个字幕块，从上一个完整字幕块的结束处继续
+                resume = window_chunks[-2]["timestamp"][1]
+                # 至少前进半个窗口，避免在长时间无断句的音频上反复转录
+                if resume is not None and resume > offset + WINDOW_LENGTH_S / 2:
+                    window_chunks = window_chunks[:-1]
+                    next_start = min(int(round(resume * SAMPLE_RATE)), end)
+
+            for chunk in window_chunks:
+                if chunk["timestamp"][1] is None:
+                    chunk["timestamp"][1] = window_end
+                chunks.append(chunk)
+            logger.info(f"转录进度: {next_start / SAMPLE_RATE:.0f}/{len(audio) / SAMPLE_RATE:.0f} 秒")
+            start = next_start
+
+        return chunks
+
+    def _transcribe_window(self, audio: np.ndarray, model_name: str, device_id: str,
+                           language: Optional[str], batch_size: int) -> List[Dict]:
+        """转录一个音频窗口"""
+        pipe = self._load_pipeline(model_name, device_id)
+
+        # 纯英语模型不接受语言和任务参数
+        generate_kwargs = {}
+        if not model_name.endswith(".en"):
+            generate_kwargs["task"] = "transcribe"
+            if language:
+                generate_kwargs["language"] = language
+
+        outputs = pipe(
+            {"raw": audio, "sampling_rate": SAMPLE_RATE},
+            chunk_length_s=CHUNK_LENGTH_S,
+            batch_size=batch_size,
+            generate_kwargs=generate_kwargs,
+            return_timestamps=True,
+        )
+        return outputs.get("chunks", [])
@@ -1,7 +1,7 @@
 import argostranslate.package
 import argostranslate.translate
 from src import logger
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import torch
 import warnings
 from functools import lru_cache
@@ -11,13 +11,22 @@ from functools import lru_cache
 warnings.filterwarnings("ignore", category=FutureWarning)
 
 class Translator:
-    def __init__(self, languages=None):
+    def __init__(self, languages=None, source_lang: str = "zh"):
         """初始化翻译器"""
         # logger.setLevel(log_level)
-        logger.debug("初始化翻译器")
+        logger.debug(f"初始化翻译器，源语言: {source_lang}")
         self.languages = languages or []
+        self.source_lang = source_lang
         self._install_language_packages()
 
+    def _translation_route(self, target_lang: str) -> List[Tuple[str, str]]:
+        """获取翻译到目标语言需要的语言对（非英语之间通过英语中转）"""
+        if target_lang == self.source_lang:
+            return []
+        if self.source_lang == "en" or target_lang == "en":
+            return [(self.source_lang, target_lang)]
+        return [(self.source_lang, "en"), ("en", target_lang)]
+
     def _install_language_packages(self):
         """安装所需的语言包"""
         try:
@@ -30,10 +39,12 @@ class Translator:
             installed_packages = argostranslate.package.get_installed_packages()
             installed_pairs = {(pkg.from_code, pkg.to_code) for pkg in installed_packages}
             
-            # 使用配置的语言对
+            # 根据源语言和目标语言计算需要的语言对
             language_pairs = []
             for lang in self.languages:
-                language_pairs.append((lang["from_code"], lang["to_code"]))
+                for pair in self._translation_route(lang["code"]):
+                    if pair not in language_pairs:
+                        language_pairs.append(pair)
             
             for from_code, to_code in language_pairs:
                 if (from_code, to_code) in installed_pairs:
@@ -70,7 +81,7 @@ class Translator:
             return ""
         
         try:
-            translator = argostranslate.translate.get_translation_from_codes("zh", "en")
+            translator = argostranslate.translate.get_translation_from_codes(self.source_lang, "en")
             return translator.translate(text)
         except Exception as e:
             logger.error(f"翻译到英语失败: {e}")
@@ -95,6 +106,9 @@ class Translator:
             logger.debug("输入文本为空，跳过翻译")
             return ""
 
+        if target_lang == self.source_lang:
+            return text
+
         if not self.is_language_supported(target_lang):
             logger.error(f"不支持的目标语言: {target_lang}")
             raise ValueError(f"不支持的目标语言代码: {target_lang}")
@@ -102,6 +116,8 @@ class Translator:
         try:
             if target_lang == 'en':
                 return self._translate_to_english(text)
+            if self.source_lang == 'en':
+                return self._translate_from_english(text, target_lang)
             english_text = self._translate_to_english(text)
             return self._translate_from_english(english_text, target_lang)
         except Exception as e:
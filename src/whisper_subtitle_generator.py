@@ -4,22 +4,34 @@ import json
 import opencc
 from typing import Dict, List
 from pathlib import Path
-import pysrt
-import tempfile
 from src import logger
+from src.memory_governor import MemoryGovernor
+from src.audio_extractor import AudioExtractor
+from src.transcriber import WhisperTranscriber
+from src.language_detector import LanguageDetector
+from src.segment_merger import SegmentMerger
+
+# 提供纯英语版本的 Whisper 模型
+ENGLISH_ONLY_MODELS = {"tiny", "base", "small", "medium"}
 
 
 class WhisperSubtitleGenerator:
-    def __init__(self, languages=None):
+    def __init__(self, languages=None, memory_governor: MemoryGovernor = None, temp_dir: str = None):
         """
         初始化字幕生成器
-        :param translator: 翻译器实例
-        :param config: Whisper 配置字典
+        :param languages: 目标语言配置列表
+        :param memory_governor: 内存调节器，用于动态调整批处理大小
+        :param temp_dir: 长音频内存映射临时文件所在目录
         """
         logger.debug("初始化字幕生成器")
         self.translator = None
         self.cc = opencc.OpenCC("s2t")  # 创建 OpenCC 实例用于简体到繁体转换
         self.languages = languages or []
+        self.memory_governor = memory_governor or MemoryGovernor(batch_size=8)
+        self.language_detector = LanguageDetector(self.memory_governor)
+        self.segment_merger = SegmentMerger()
+        self.audio_extractor = AudioExtractor(temp_dir=temp_dir)
+        self.transcriber = WhisperTranscriber(self.memory_governor)
 
     def get_media_info(self, input_path: str) -> dict:
         """获取媒体文件信息"""
@@ -183,8 +195,11 @@ class WhisperSubtitleGenerator:
                           f"{stream['channels']}ch")
         logger.info(separator)
 
-    def generate_subtitles(self, input_path: str, device_id: str, model_name: str):
-        """生成字幕文件"""
+    def generate_subtitles(self, input_path: str, device_id: str, model_name: str, keep_intermediate: bool = False):
+        """
+        生成字幕文件，音频在内存中解码后直接交给转录模型
+        :param keep_intermediate: 是否保留中间的 WAV 和 JSON 文件
+        """
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"文件不存在: {input_path}")
 
@@ -193,41 +208,53 @@ class WhisperSubtitleGenerator:
 
         output_dir = os.path.dirname(input_path)
         base_name = os.path.splitext(os.path.basename(input_path))[0]
-        
-        json_path = os.path.join(output_dir, f"{base_name}.json")
 
-        command = [
-            'insanely-fast-whisper', 
-            '--file-name', input_path,
-            "--device-id", device_id,
-            "--model-name", model_name,
-            '--transcript-path', json_path
-        ]
+        audio = self.audio_extractor.load_audio(input_path)
 
-        result = subprocess.run(command, capture_output=True, text=True)
+        # 检测音频语言，并据此选择模型
+        language = self.language_detector.detect_audio(audio, device_id)
+        model_name = self._select_model_for_language(model_name, language)
 
-        if result.returncode != 0:
-            raise RuntimeError(f"生成字幕失败: {result.stderr}")
+        chunks = self.transcriber.transcribe(audio, model_name, device_id, language)
+        del audio
 
         srt_path = os.path.join(output_dir, f"{base_name}.srt")
-        
-        self._json_to_srt(json_path, srt_path)
-        
-        if os.path.exists(json_path):
-            os.remove(json_path)
+        if chunks:
+            self._save_chunks_to_srt(chunks, srt_path)
+        else:
+            logger.warning("转录结果中未找到字幕块")
 
-        return {"subtitle": srt_path}
+        subtitle_paths = {"subtitle": srt_path}
+        if keep_intermediate:
+            subtitle_paths.update(self._save_intermediate(input_path, chunks))
+        return subtitle_paths
 
-    def process_subtitle_file(self, subtitle_path: str, output_dir: str, device_id: str = "mps", model_name: str = "large-v3-turbo"):
+    def _save_intermediate(self, input_path: str, chunks: List[Dict]) -> Dict[str, str]:
+        """按需保存中间的 WAV 和 JSON 文件"""
+        json_path = os.path.splitext(input_path)[0] + ".json"
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"chunks": chunks}, f, ensure_ascii=False, indent=2)
+
+        paths = {"transcript": json_path}
+        if os.path.splitext(input_path)[1].lower() != ".wav":
+            paths["audio"] = self.audio_extractor.extract_audio(input_path)
+        return paths
+
+    def _select_model_for_language(self, model_name: str, language: str) -> str:
+        """英语音频优先使用纯英语模型"""
+        size = model_name.rsplit("whisper-", 1)[-1]
+        if language == "en" and size in ENGLISH_ONLY_MODELS:
+            model_name = f"{model_name}.en"
+            logger.info(f"检测到英语音频，使用纯英语模型: {model_name}")
+        return model_name
+
+    def process_subtitle_file(self, subtitle_path: str, output_dir: str, device_id: str = "mps", model_name: str = "large-v3-turbo", source_lang: str = None):
         """处理字幕文件并生成多语言翻译"""
         from .translator import Translator
         
         if not os.path.exists(subtitle_path):
             raise FileNotFoundError(f"字幕文件不存在: {subtitle_path}")
 
-        if self.translator is None:
-            self.translator = Translator(languages=self.languages)
-
         base_name = os.path.splitext(os.path.basename(subtitle_path))[0]
 
         # 加载字幕内容
@@ -236,27 +263,33 @@ class WhisperSubtitleGenerator:
         else:
             chunks = self._load_srt_chunks(subtitle_path)
 
-        # 生成基础字幕
-        translated_chunks = {
-            "simplified": self._convert_to_simplified(chunks),
-            "traditional": self._convert_to_traditional(chunks)
-        }
+        # 检测源语言，跳过与源语言相同的目标语言
+        if source_lang is None:
+            source_lang = self.language_detector.detect_text(chunks)
+        languages = [lang for lang in self.languages if lang["code"] != source_lang]
+
+        if self.translator is None or self.translator.source_lang != source_lang:
+            self.translator = Translator(languages=languages, source_lang=source_lang)
+
+        translated_chunks = {}
+        subtitle_paths = {}
+
+        # 中文源字幕生成简繁体版本
+        if source_lang == "zh":
+            translated_chunks["simplified"] = self._convert_to_simplified(chunks)
+            translated_chunks["traditional"] = self._convert_to_traditional(chunks)
+            subtitle_paths["simplified"] = os.path.join(output_dir, f"{base_name}_zh.srt")
+            subtitle_paths["traditional"] = os.path.join(output_dir, f"{base_name}_zh_hant.srt")
 
         # 为每个配置的语言生成翻译
-        for lang in self.languages:
+        for lang in languages:
             translated_chunks[lang["name"]] = self._translate_chunks(
                 chunks, 
                 lang["code"]
             )
 
-        # 生成输出文件路径
-        subtitle_paths = {
-            "simplified": os.path.join(output_dir, f"{base_name}_zh.srt"),
-            "traditional": os.path.join(output_dir, f"{base_name}_zh_hant.srt")
-        }
-
         # 添加其他语言的输出路径
-        for lang in self.languages:
+        for lang in languages:
             subtitle_paths[lang["name"]] = os.path.join(
                 output_dir, 
                 f"{base_name}_{lang['code']}.srt"
@@ -268,18 +301,6 @@ class WhisperSubtitleGenerator:
 
         return subtitle_paths
 
-    def _json_to_srt(self, json_path: str, srt_path: str):
-        """将JSON格式转换为SRT格式"""
-        with open(json_path, "r", encoding="utf-8") as f:
-            json_data = json.load(f)
-
-        chunks = json_data.get("chunks", [])
-        if not chunks:
-            logger.warning("JSON数据中未找到字幕块")
-            return
-
-        self._save_chunks_to_srt(chunks, srt_path)
-
     def _format_time(self, seconds):
         """格式化时间为SRT格式"""
         millis = int((seconds - int(seconds)) * 1000)
@@ -333,30 +354,28 @@ class WhisperSubtitleGenerator:
         return chunks
 
     def _translate_chunks(self, chunks: List[Dict], target_lang: str) -> List[Dict]:
-        """翻译字幕块"""
+        """将字幕块合并为句子后逐句翻译，再把译文分配回原字幕块"""
         logger.debug(f"开始翻译字幕块，目标语言: {target_lang}")
+        units = self.segment_merger.merge(chunks)
+        logger.debug(f"{len(chunks)} 个字幕块合并为 {len(units)} 个句子")
         translated_chunks = []
         
-        for i, chunk in enumerate(chunks, 1):
+        for i, unit in enumerate(units, 1):
             try:
-                text = chunk["text"].strip()
-                logger.debug(f"正在翻译第 {i}/{len(chunks)} 个字幕块")
+                text = unit["text"].strip()
+                logger.debug(f"正在翻译第 {i}/{len(units)} 个句子")
                 logger.debug(f"原文: {text}")
                 
                 translated_text = self.translator.translate(text, target_lang)
                 logger.debug(f"译文: {translated_text}")
                 
-                translated_chunks.append({
-                    "timestamp": chunk["timestamp"],
-                    "text": translated_text if translated_text else ""
-                })
-                
             except Exception as e:
-                logger.error(f"翻译第 {i} 个字幕块时出错: {e}")
-                translated_chunks.append({
-                    "timestamp": chunk["timestamp"],
-                    "text": ""
-                })
+                logger.error(f"翻译第 {i} 个句子时出错: {e}")
+                translated_text = ""
+
+            translated_chunks.extend(
+                self.segment_merger.redistribute(unit, translated_text or "", chunks)
+            )
         
         return translated_chunks
 